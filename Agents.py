@@ -3,14 +3,7 @@ from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from crewai import Agent
 
-from Tools import (
-    IntentClassifierTool,
-    FetchMovieInfoTool,
-    FetchMovieReviewsTool,
-    SearchSimilarMoviesTool,
-    RecommendByGenreTool,
-    FetchTrendingMoviesTool
-)
+from Tools import all_tools
 
 load_dotenv()
 
@@ -28,7 +21,7 @@ manager_agent = Agent(
     backstory="""You are the manager of a team of film and TV show specialists. 
                 Your role is to understand what the user is asking for and direct 
                 the query to the most appropriate specialist.""",
-    tools=[IntentClassifierTool()],
+    tools=[all_tools['intent_classifier']],
     verbose=True,
     llm=llm
 )
@@ -39,7 +32,7 @@ information_agent = Agent(
     backstory="""You are an encyclopedia of knowledge about cinema and television.
                 Your role is to provide detailed, contextualized, and well-formatted 
                 information about movies, TV shows, cast, and production teams.""",
-    tools=[FetchMovieInfoTool(), FetchMovieReviewsTool()],
+    tools=[all_tools['fetch_movie_info'], all_tools['fetch_multiple_movies_info'], all_tools['fetch_movie_reviews']],
     verbose=True,
     llm=llm
 )
@@ -50,7 +43,7 @@ recommendation_agent = Agent(
     backstory="""You are a film curator specialized in making personalized recommendations.
                 Your role is to understand user preferences and suggest relevant 
                 and high-quality content.""",
-    tools=[SearchSimilarMoviesTool(), RecommendByGenreTool()],
+    tools=[all_tools['search_similar_movies'], all_tools['recommend_by_genre'], all_tools['fetch_multiple_movies_info']],
     verbose=True,
     llm=llm
 )
@@ -61,7 +54,7 @@ trends_agent = Agent(
     backstory="""You are a specialist in entertainment world trends.
                 Your role is to keep users updated on the most popular
                 and trending content at the moment.""",
-    tools=[FetchTrendingMoviesTool()],
+    tools=[all_tools['fetch_trending_movies']],
     verbose=True,
     llm=llm
 )
@@ -1,5 +1,14 @@
+import atexit
+import hashlib
+import logging
 import re
-import traceback
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from functools import lru_cache
+from typing import Callable, Optional, Tuple
 from crewai import Crew, Process
 
 from Agents import (
@@ -9,6 +18,8 @@ from Agents import (
     trends_agent
 )
 
+from Tools import classify_query_intent
+
 from Tasks import (
     create_manager_task,
     create_information_task,
@@ -18,39 +29,174 @@ from Tasks import (
     create_retry_trends_task
 )
 
+logger = logging.getLogger(__name__)
+
+# Agent, task factory and retry task factory (if any) for each specialist
+SPECIALISTS = {
+    "information_agent": (information_agent, create_information_task, create_retry_information_task),
+    "trends_agent": (trends_agent, create_trends_task, create_retry_trends_task),
+    "recommendation_agent": (recommendation_agent, create_recommendation_task, None)
+}
+
+# Classifier confidence at or above which the manager agent is not consulted
+MANAGER_SKIP_CONFIDENCE = 0.85
+
+# Phrases in the manager's analysis that select each specialist, in priority order
+AGENT_ROUTE_PHRASES = {
+    "information_agent": r"information_agent|information agent|movie info|film information",
+    "trends_agent": r"trends_agent|trends agent|trending",
+    "recommendation_agent": r"recommendation_agent|recommendation agent|recommendations"
+}
+AGENT_ROUTE_PATTERN = re.compile(
+    "|".join(f"(?P<{name}>{phrases})" for name, phrases in AGENT_ROUTE_PHRASES.items())
+)
+
+def route_from_manager_analysis(manager_analysis: str) -> Optional[str]:
+    """
+    Returns the specialist named in the manager's analysis, or None.
+    Scans the text once and applies the priority order afterwards.
+    """
+    mentioned = {match.lastgroup for match in AGENT_ROUTE_PATTERN.finditer(manager_analysis.lower())}
+    return next((name for name in AGENT_ROUTE_PHRASES if name in mentioned), None)
+
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PLEASE = re.compile(r"^please,?\s+|,?\s+please$")
+def normalize_query(query: str) -> str:
+    """
+    Canonical form used for cache keys: NFKC, case-folded, single spaces, no
+    trailing "?" and no leading or trailing "please". Everything else is kept
+    because it can be part of a title ("The Batman", "Mother!", "Please Stand By").
+    """
+    text = unicodedata.normalize("NFKC", query).casefold()
+    text = _WHITESPACE.sub(" ", text).strip().rstrip("?").rstrip()
+    return _EDGE_PLEASE.sub("", text)
+
+@lru_cache(maxsize=4096)
+def _hash_normalized_query(normalized_query: str) -> str:
+    return hashlib.blake2b(normalized_query.encode("utf-8"), digest_size=16).hexdigest()
+
 class QueryCache:
-    """Simple in-memory cache for query results to avoid redundant processing"""
+    """
+    SQLite-backed cache for query results to avoid redundant processing.
+    """
     
-    def __init__(self, max_size=100):
-        self.cache = {}
+    def __init__(self, max_size=100, cache_file="query_cache.db", lock_stripes=16, expiry_seconds=86400):
         self.max_size = max_size
+        self.expiry_seconds = expiry_seconds
+        self.cache_file = cache_file
+        self._key_locks = [threading.Lock() for _ in range(lock_stripes)]
+        # One connection shared by the Gradio worker threads, serialized by a lock.
+        # It is opened on first use so importing this module stays cheap.
+        self._db_lock = threading.Lock()
+        self._init_lock = threading.Lock()
+        self._conn = None
+    
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            with self._init_lock:
+                if self._conn is None:
+                    conn = sqlite3.connect(self.cache_file, isolation_level=None, check_same_thread=False)
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute("PRAGMA synchronous=NORMAL")
+                    conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB, ts REAL)")
+                    conn.execute("CREATE INDEX IF NOT EXISTS cache_ts ON cache (ts)")
+                    conn.execute("DELETE FROM cache WHERE ts < ?", (self._expiry_cutoff(),))
+                    self._conn = conn
+        return self._conn
+    
+    @staticmethod
+    def get_query_hash(query: str) -> str:
+        return _hash_normalized_query(normalize_query(query))
+    
+    def __len__(self):
+        with self._db_lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM cache WHERE ts >= ?", (self._expiry_cutoff(),)
+            ).fetchone()[0]
     
     def get(self, key):
-        return self.cache.get(key)
+        return self._get_by_hash(self.get_query_hash(key))
+    
+    def _get_by_hash(self, key_hash):
+        with self._db_lock:
+            row = self.conn.execute(
+                "SELECT value FROM cache WHERE key = ? AND ts >= ?", (key_hash, self._expiry_cutoff())
+            ).fetchone()
+        if row is None:
+            return None
+        return zlib.decompress(row[0]).decode("utf-8")
+    
+    def get_or_run(self, key, fn: Callable[[], str]) -> Tuple[str, bool]:
+        """
+        Returns the cached value for key, computing it with fn on a miss.
+        Concurrent callers with the same key wait on a striped lock so fn
+        runs only once; exceptions from fn propagate and nothing is stored.
+        
+        Returns:
+            A (value, is_cached) tuple
+        """
+        value = self.get(key)
+        if value is not None:
+            return value, True
+        
+        with self._key_locks[hash(self.get_query_hash(key)) % len(self._key_locks)]:
+            value = self.get(key)
+            if value is not None:
+                return value, True
+            
+            value = fn()
+            self.set(key, value)
+            return value, False
     
     def set(self, key, value):
-        if len(self.cache) >= self.max_size:
-            self.cache.pop(next(iter(self.cache)))
-        self.cache[key] = value
-    
-    def save_cache(self):
-        try:
-            import pickle
-            with open("query_cache.pkl", "wb") as f:
-                pickle.dump(self.cache, f)
-            return True
-        except Exception as e:
-            print(f"Error saving cache: {e}")
-            return False
+        key_hash = self.get_query_hash(key)
+        compressed = zlib.compress(value.encode("utf-8"), 3)
+        with self._db_lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, ts) VALUES (?, ?, ?)", (key_hash, compressed, time.time())
+            )
+            # Evict the oldest entries once the cache grows past max_size
+            self.conn.execute(
+                "DELETE FROM cache WHERE key IN "
+                "(SELECT key FROM cache ORDER BY ts LIMIT MAX((SELECT COUNT(*) FROM cache) - ?, 0))",
+                (self.max_size,)
+            )
+            self._clean_expired()
+    
+    def _expiry_cutoff(self) -> float:
+        return time.time() - self.expiry_seconds
+    
+    def _clean_expired(self):
+        # Range delete on the ts index, so it only touches expired rows; callers hold _db_lock
+        self.conn.execute("DELETE FROM cache WHERE ts < ?", (self._expiry_cutoff(),))
+    
+    def clear(self):
+        with self._db_lock:
+            self.conn.execute("DELETE FROM cache")
+    
+    def close(self):
+        """Folds the WAL back into the database file and closes the connection"""
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                self._conn.close()
+                self._conn = None
+    
+    def last_updated(self) -> Optional[float]:
+        """Timestamp of the most recent write, or None if the cache is empty"""
+        with self._db_lock:
+            return self.conn.execute("SELECT MAX(ts) FROM cache").fetchone()[0]
 
 # Initialize cache
 query_cache = QueryCache()
+atexit.register(query_cache.close)
 
 def process_film_buff_query(query: str) -> str:
     """
     Processes a user query using the hierarchical agent structure.
-    First routes the query through the manager agent to determine
-    which specialist agent should handle it.
+    Clear intents go straight to their specialist agent; only queries the
+    intent classifier is unsure about are routed through the manager agent.
     
     Args:
         query: The user's question about movies or TV shows
@@ -58,125 +204,28 @@ def process_film_buff_query(query: str) -> str:
     Returns:
         A formatted response to the user's query
     """
-    # Check cache first
-    cached_result = query_cache.get(query)
-    if cached_result:
-        print("Using cached result")
-        return cached_result
+    response, _ = process_film_buff_query_cached(query)
+    return response
+
+def process_film_buff_query_cached(query: str) -> Tuple[str, bool]:
+    """
+    Same as process_film_buff_query, but also reports whether the
+    response was served from the query cache.
     
-    try:
-        print(f"Processing query: '{query}'")
-        
-        # Step 1: Manager analyzes the query
-        manager_crew = Crew(
-            agents=[manager_agent],
-            tasks=[create_manager_task(query)],
-            process=Process.sequential,
-            verbose=True
-        )
-        
-        manager_analysis = str(manager_crew.kickoff())
-        print(f"Manager analysis: {manager_analysis}")
-        
-        # Extract target agent from manager's analysis
-        target_agent = None
-        
-        # Check for explicit mentions of agents or intentions in various forms
-        if any(term in manager_analysis.lower() for term in ["information_agent", "information agent", "movie info", "film information"]):
-            target_agent = "information_agent"
-            print("Delegating to Information Agent")
-            specialist_crew = Crew(
-                agents=[information_agent],
-                tasks=[create_information_task(query)],
-                process=Process.sequential,
-                verbose=True
-            )
-        elif any(term in manager_analysis.lower() for term in ["trends_agent", "trends agent", "trending"]):
-            target_agent = "trends_agent"
-            print("Delegating to Trends Agent")
-            specialist_crew = Crew(
-                agents=[trends_agent],
-                tasks=[create_trends_task(query)],
-                process=Process.sequential,
-                verbose=True
-            )
-        elif any(term in manager_analysis.lower() for term in ["recommendation_agent", "recommendation agent", "recommendations"]):
-            target_agent = "recommendation_agent"
-            print("Delegating to Recommendation Agent")
-            specialist_crew = Crew(
-                agents=[recommendation_agent],
-                tasks=[create_recommendation_task(query)],
-                process=Process.sequential,
-                verbose=True
-            )
-        else:
-            # If the target agent cannot be clearly determined
-            print("Target agent not clearly identified, determining from context")
-            
-            # Additional context analysis to identify the query type
-            if "information" in query.lower() or "details" in query.lower() or "about" in query.lower():
-                target_agent = "information_agent"
-                print("Context suggests Information Agent")
-                specialist_crew = Crew(
-                    agents=[information_agent],
-                    tasks=[create_information_task(query)],
-                    process=Process.sequential,
-                    verbose=True
-                )
-            else:
-                target_agent = "recommendation_agent"  # Default fallback
-                print("Using Recommendation Agent as default")
-                specialist_crew = Crew(
-                    agents=[recommendation_agent],
-                    tasks=[create_recommendation_task(query)],
-                    process=Process.sequential,
-                    verbose=True
-                )
-        
-        # Step 2: Specialist agent processes the query
-        specialist_result = str(specialist_crew.kickoff())
-        
-        # Step 3: Check if the result is valid
-        if len(specialist_result.strip()) < 50:
-            print(f"Result from {target_agent} too short, trying to improve")
-            
-            # Try again with the same agent but more specific instructions
-            if target_agent == "trends_agent":
-                print("Additional attempt with Trends Agent")
-                retry_crew = Crew(
-                    agents=[trends_agent],
-                    tasks=[create_retry_trends_task(query)],
-                    process=Process.sequential,
-                    verbose=True
-                )
-                
-                improved_result = str(retry_crew.kickoff())
-                
-                # Check if the new response is better
-                if len(improved_result.strip()) > 50:
-                    specialist_result = improved_result
-            elif target_agent == "information_agent":
-                # Specific retry for Information Agent
-                print("Additional attempt with Information Agent")
-                retry_crew = Crew(
-                    agents=[information_agent],
-                    tasks=[create_retry_information_task(query)],
-                    process=Process.sequential,
-                    verbose=True
-                )
-                
-                improved_result = str(retry_crew.kickoff())
-                
-                if len(improved_result.strip()) > 50:
-                    specialist_result = improved_result
+    Args:
+        query: The user's question about movies or TV shows
         
-        # Cache and return
-        query_cache.set(query, specialist_result)
-        return specialist_result
+    Returns:
+        A (response, is_cached) tuple
+    """
+    try:
+        response, is_cached = query_cache.get_or_run(query, lambda: run_agent_pipeline(query))
+        if is_cached:
+            logger.info("Using cached result")
+        return response, is_cached
         
     except Exception as e:
-        print(f"Error processing query: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error processing query %r", query)
         return f"""# Sorry, an error occurred processing your query
 
 Could not process: "{query}"
@@ -189,9 +238,95 @@ Please try:
 3. Using simpler queries
 
 Thank you for your understanding!
-"""
+""", False
+
+def create_specialist_crew(target_agent: str, query: str, retry: bool = False) -> Crew:
+    """
+    Builds the single-task crew for the given specialist agent, using the
+    retry task when retry is True. Unknown names fall back to recommendations.
+    """
+    agent, create_task, create_retry_task = SPECIALISTS.get(target_agent, SPECIALISTS["recommendation_agent"])
+    task = create_retry_task(query) if retry else create_task(query)
+    
+    return Crew(
+        agents=[agent],
+        tasks=[task],
+        process=Process.sequential,
+        verbose=True
+    )
+
+def run_managed_delegation(query: str) -> Tuple[str, str]:
+    """
+    Lets the manager agent pick the specialist for an ambiguous query.
+    
+    Returns:
+        The chosen specialist and its result
+    """
+    # Step 1: Manager analyzes the query
+    manager_crew = Crew(
+        agents=[manager_agent],
+        tasks=[create_manager_task(query)],
+        process=Process.sequential,
+        verbose=True
+    )
+    manager_analysis = str(manager_crew.kickoff())
+    logger.info("Manager analysis: %s", manager_analysis)
+    
+    # Extract target agent from manager's analysis
+    target_agent = route_from_manager_analysis(manager_analysis)
+    
+    if target_agent is None:
+        # If the target agent cannot be clearly determined
+        logger.info("Target agent not clearly identified, determining from context")
+        
+        # Additional context analysis to identify the query type
+        query_lower = query.lower()
+        if "information" in query_lower or "details" in query_lower or "about" in query_lower:
+            target_agent = "information_agent"
+            logger.info("Context suggests Information Agent")
+        else:
+            target_agent = "recommendation_agent"  # Default fallback
+            logger.info("Using Recommendation Agent as default")
+    
+    # Step 2: Specialist agent processes the query
+    logger.info("Delegating to %s", target_agent)
+    return target_agent, str(create_specialist_crew(target_agent, query).kickoff())
+
+def run_agent_pipeline(query: str) -> str:
+    """
+    Runs the specialist crew for a query without touching the cache. The
+    manager agent is only consulted when the intent classifier is unsure.
+    Errors are raised to the caller.
+    """
+    logger.info("Processing query: %r", query)
+    
+    intent = classify_query_intent(query)
+    
+    if intent["confidence"] >= MANAGER_SKIP_CONFIDENCE:
+        # The manager would route with the same classifier, so skip its LLM round trip
+        target_agent = intent["target_agent"]
+        logger.info("Intent %r is unambiguous, delegating to %s", intent["intent"], target_agent)
+        specialist_result = str(create_specialist_crew(target_agent, query).kickoff())
+    else:
+        target_agent, specialist_result = run_managed_delegation(query)
+    
+    # Step 3: Check if the result is valid
+    if len(specialist_result.strip()) < 50:
+        logger.info("Result from %s too short, trying to improve", target_agent)
+        
+        # Try again with the same agent but more specific instructions
+        if SPECIALISTS[target_agent][2] is not None:
+            logger.info("Additional attempt with %s", target_agent)
+            improved_result = str(create_specialist_crew(target_agent, query, retry=True).kickoff())
+            
+            # Check if the new response is better
+            if len(improved_result.strip()) > 50:
+                specialist_result = improved_result
+    
+    return specialist_result
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     print("Testing Film Buff with CrewAI...")
     
     info_query = "Tell me about the movie Interstellar"
@@ -2,10 +2,13 @@ import os
 import gradio as gr
 import time
 import json
+import logging
 import re
 import threading
+from collections import deque
 from datetime import datetime, timedelta
-from Crew import process_film_buff_query, query_cache
+from Crew import process_film_buff_query_cached, query_cache
+from Tools import get_token_encoder
 
 VERSION = "1.0.0"  
 LAST_UPDATED = "April 2025"
@@ -48,9 +51,7 @@ EXAMPLES = [
 
 def count_tokens(text):
     try:
-        import tiktoken
-        encoder = tiktoken.encoding_for_model("gpt-3.5-turbo")
-        tokens = encoder.encode(text)
+        tokens = get_token_encoder().encode(text)
         return len(tokens)
     except ImportError:
         if not text:
@@ -64,13 +65,18 @@ class RateLimiter:
     def __init__(self, max_calls=5, period=60):
         self.max_calls = max_calls  
         self.period = period 
-        self.calls = []  
+        self.calls = deque()  
         self.lock = threading.Lock() 
     
+    def _drop_expired(self, now):
+        # Calls are appended in time order, so expired ones sit at the head
+        while self.calls and now - self.calls[0] >= self.period:
+            self.calls.popleft()
+    
     def can_proceed(self) -> bool:
         now = time.time()
         with self.lock:
-            self.calls = [t for t in self.calls if now - t < self.period]
+            self._drop_expired(now)
             
             if len(self.calls) < self.max_calls:
                 self.calls.append(now)
@@ -79,13 +85,12 @@ class RateLimiter:
                 return False
     
     def time_until_available(self) -> int:
-        if self.can_proceed():
-            return 0
-            
         with self.lock:
             now = time.time()
-            oldest_call = min(self.calls)
-            return int(self.period - (now - oldest_call)) + 1
+            self._drop_expired(now)
+            if len(self.calls) < self.max_calls:
+                return 0
+            return int(self.period - (now - self.calls[0])) + 1
 
 rate_limiter = RateLimiter(max_calls=5, period=60)
 
@@ -106,13 +111,20 @@ def load_history():
         print(f"Error loading chat history: {e}")
         return []
 
+# Compiled once at import; applied in order to every response
+CONTENT_REWRITES = [
+    (re.compile(r"\]\s*-\s*⭐"), " - ⭐"),
+    (re.compile(r"(\([0-9]{4}\))\]"), r"\1"),
+    (re.compile(r"\"([^\"]+)\""), r"**\1**"),
+    (re.compile(r"(\d\.\d\/10)"), r"**\1**")
+]
+STRAY_BRACKET_PATTERN = re.compile(r"(\S)\](\s|$|:)")
+
 def enhance_content(text):
-    text = re.sub(r"\]\s*-\s*⭐", " - ⭐", text)
-    text = re.sub(r"(\([0-9]{4}\))\]", r"\1", text)
-    text = re.sub(r"\"([^\"]+)\"", r"**\1**", text)
-    text = re.sub(r"(\d\.\d\/10)", r"**\1**", text)
+    for pattern, replacement in CONTENT_REWRITES:
+        text = pattern.sub(replacement, text)
     text = text.replace("https://www.themoviedb.org", "[TMDb](https://www.themoviedb.org")
-    text = re.sub(r"(\S)\](\s|$|:)", r"\1\2", text)
+    text = STRAY_BRACKET_PATTERN.sub(r"\1\2", text)
     return text
 
 def handle_api_error(error):
@@ -138,29 +150,36 @@ def validate_input(message):
     return True, ""
 
 def process_message(message, history):
+    cache_stats_text = get_cache_stats()
+    cache_time_text = get_cache_timestamp()
+    
     valid, error_msg = validate_input(message)
     if not valid:
-        return history + [
+        yield history + [
             {"role": "user", "content": message},
             {"role": "assistant", "content": f"⚠️ {error_msg}"}
-        ], get_cache_stats(), get_cache_timestamp(), ""
+        ], cache_stats_text, cache_time_text, ""
+        return
     
     if not rate_limiter.can_proceed():
         wait_time = rate_limiter.time_until_available()
-        return history + [
+        yield history + [
             {"role": "user", "content": message},
             {"role": "assistant", "content": f"⚠️ **Rate limit exceeded**. Please wait {wait_time} seconds before sending another query to protect our API usage."}
-        ], get_cache_stats(), get_cache_timestamp(), ""
+        ], cache_stats_text, cache_time_text, ""
+        return
     
     yield history + [
         {"role": "user", "content": message},
         {"role": "assistant", "content": "Processing your query... ⌛"}
-    ], get_cache_stats(), get_cache_timestamp(), ""
+    ], cache_stats_text, cache_time_text, ""
     
     try:
-        response = process_film_buff_query(message)
+        response, is_cached = process_film_buff_query_cached(message)
         
-        is_cached = query_cache.get(message) is not None
+        # The cache may have changed while the query ran, so refresh once
+        cache_stats_text = get_cache_stats()
+        cache_time_text = get_cache_timestamp()
         
         enhanced_response = enhance_content(response)
         
@@ -169,11 +188,10 @@ def process_message(message, history):
             {"role": "assistant", "content": enhanced_response}
         ]
         
-        cache_stats_text = get_cache_stats()
         if is_cached:
             cache_stats_text = f"{cache_stats_text} (last response from cache)"
         
-        yield updated_history, cache_stats_text, get_cache_timestamp(), ""
+        yield updated_history, cache_stats_text, cache_time_text, ""
         
         save_history(updated_history)
         
@@ -193,8 +211,7 @@ def load_example(example):
     return example
 
 def clear_history_and_cache():
-    query_cache.cache = {}
-    query_cache.save_cache()
+    query_cache.clear()
     if os.path.exists(HISTORY_FILE):
         os.remove(HISTORY_FILE)
     return [], [{"role": "assistant", "content": "History and cache cleared successfully!"}], get_cache_stats(), get_cache_timestamp()
@@ -205,15 +222,16 @@ def clear_chat_only():
     return [], [{"role": "assistant", "content": "Chat history cleared. Cache remains intact."}], get_cache_stats(), get_cache_timestamp()
 
 def get_cache_stats():
-    if query_cache.cache:
-        num_entries = len(query_cache.cache)
+    num_entries = len(query_cache)
+    if num_entries:
         return f"Current cache: {num_entries} stored queries"
     else:
         return "Current cache: empty"
 
 def get_cache_timestamp():
-    if os.path.exists("query_cache.pkl"):
-        cache_timestamp = datetime.fromtimestamp(os.path.getmtime("query_cache.pkl"))
+    last_updated = query_cache.last_updated()
+    if last_updated is not None:
+        cache_timestamp = datetime.fromtimestamp(last_updated)
         return f"Last update: {cache_timestamp.strftime('%m/%d/%Y %H:%M:%S')}"
     return "Cache not yet created"
 
@@ -571,5 +589,6 @@ if __name__ == "__main__":
         subprocess.check_call([sys.executable, "-m", "pip", "install", "gradio"])
         print("Dependencies installed successfully!")
     
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s: %(message)s")
     print(f"Starting {SYSTEM_NAME}...")
     demo.launch(share=True, inbrowser=True)
\ No newline at end of file
@@ -8,13 +8,7 @@ from Agents import (
     trends_agent
 )
 
-def create_manager_task(query: str) -> Task:
-    """
-    Creates a task for the Manager Agent to analyze the user's query
-    and determine which specialist agent should handle it.
-    """
-    return Task(
-        description=f"""
+_MANAGER_DESCRIPTION = """
         # User Query Analysis
         
         Analyze the following user query: "{query}"
@@ -27,18 +21,20 @@ def create_manager_task(query: str) -> Task:
         - The identified query type
         - The agent that should process this query
         - A brief explanation of why this classification
-        """,
-        expected_output="Query analysis with type and responsible agent",
-        agent=manager_agent
-    )
+        """
 
-def create_information_task(query: str) -> Task:
+def create_manager_task(query: str) -> Task:
     """
-    Creates a task for the Information Agent to provide detailed
-    information about movies or TV shows.
+    Creates a task for the Manager Agent to analyze the user's query
+    and determine which specialist agent should handle it.
     """
     return Task(
-        description=f"""
+        description=_MANAGER_DESCRIPTION.format(query=query),
+        expected_output="Query analysis with type and responsible agent",
+        agent=manager_agent
+    )
+
+_INFORMATION_DESCRIPTION = """
         # Content Information Search
         
         The user is looking for information about: "{query}"
@@ -73,18 +69,20 @@ def create_information_task(query: str) -> Task:
            - Include title, year, synopsis, genres, cast, direction, etc.
         
         Format your response using markdown to improve readability.
-        """,
-        expected_output="Information about the content - specific or general as requested",
-        agent=information_agent
-    )
+        """
 
-def create_recommendation_task(query: str) -> Task:
+def create_information_task(query: str) -> Task:
     """
-    Creates a task for the Recommendation Agent to provide personalized
-    movie and TV show recommendations based on user preferences.
+    Creates a task for the Information Agent to provide detailed
+    information about movies or TV shows.
     """
     return Task(
-        description=f"""
+        description=_INFORMATION_DESCRIPTION.format(query=query),
+        expected_output="Information about the content - specific or general as requested",
+        agent=information_agent
+    )
+
+_RECOMMENDATION_DESCRIPTION = """
         # Personalized Recommendations
         
         The user is looking for recommendations: "{query}"
@@ -102,18 +100,20 @@ def create_recommendation_task(query: str) -> Task:
         - Why you believe these choices align with the query
         
         Format your response using markdown to improve readability.
-        """,
-        expected_output="Personalized list of recommendations with explanations",
-        agent=recommendation_agent
-    )
+        """
 
-def create_trends_task(query: str) -> Task:
+def create_recommendation_task(query: str) -> Task:
     """
-    Creates a task for the Trends Agent to provide information about
-    currently trending movies and TV shows.
+    Creates a task for the Recommendation Agent to provide personalized
+    movie and TV show recommendations based on user preferences.
     """
     return Task(
-        description=f"""
+        description=_RECOMMENDATION_DESCRIPTION.format(query=query),
+        expected_output="Personalized list of recommendations with explanations",
+        agent=recommendation_agent
+    )
+
+_TRENDS_DESCRIPTION = """
         # Current Trends in Movies and TV Shows
         
         The user wants to know about trends: "{query}"
@@ -155,18 +155,20 @@ def create_trends_task(query: str) -> Task:
         ```
         
         IMPORTANT: You MUST format a complete response with all items from the tool results.
-        """,
-        expected_output="Detailed and formatted list of trending content",
-        agent=trends_agent
-    )
+        """
 
-def create_retry_information_task(query: str) -> Task:
+def create_trends_task(query: str) -> Task:
     """
-    Creates a retry task for the Information Agent with more specific instructions
-    when the initial response was too short or incomplete.
+    Creates a task for the Trends Agent to provide information about
+    currently trending movies and TV shows.
     """
     return Task(
-        description=f"""
+        description=_TRENDS_DESCRIPTION.format(query=query),
+        expected_output="Detailed and formatted list of trending content",
+        agent=trends_agent
+    )
+
+_RETRY_INFORMATION_DESCRIPTION = """
         # CRITICAL TASK: Provide Detailed Information
         
         The user asked: "{query}"
@@ -185,18 +187,20 @@ def create_retry_information_task(query: str) -> Task:
         - Important facts
         
         Make sure to provide a thorough and well-formatted response using markdown.
-        """,
-        expected_output="Detailed information about the movie or TV show",
-        agent=information_agent
-    )
+        """
 
-def create_retry_trends_task(query: str) -> Task:
+def create_retry_information_task(query: str) -> Task:
     """
-    Creates a retry task for the Trends Agent with more specific formatting 
-    instructions when the initial response was inadequate.
+    Creates a retry task for the Information Agent with more specific instructions
+    when the initial response was too short or incomplete.
     """
     return Task(
-        description=f"""
+        description=_RETRY_INFORMATION_DESCRIPTION.format(query=query),
+        expected_output="Detailed information about the movie or TV show",
+        agent=information_agent
+    )
+
+_RETRY_TRENDS_DESCRIPTION = """
         # CRITICAL TASK: Format Movie/TV Show Trends
         
         The user asked: "{query}"
@@ -224,7 +228,15 @@ def create_retry_trends_task(query: str) -> Task:
         ## Other Trending Content:
         
         [LIST ALL OTHER MOVIES/TV SHOWS IN THE SAME FORMAT]
-        """,
+        """
+
+def create_retry_trends_task(query: str) -> Task:
+    """
+    Creates a retry task for the Trends Agent with more specific formatting 
+    instructions when the initial response was inadequate.
+    """
+    return Task(
+        description=_RETRY_TRENDS_DESCRIPTION.format(query=query),
         expected_output="Complete and formatted list of trending movies and TV shows",
         agent=trends_agent
     )
@@ -0,0 +1,13 @@
+from Crew import QueryCache, normalize_query
+
+
+def test_titles_keep_their_own_cache_key():
+    assert QueryCache.get_query_hash("Tell me about The Batman") != QueryCache.get_query_hash("Tell me about Batman")
+    assert QueryCache.get_query_hash("Tell me about Mother!") != QueryCache.get_query_hash("Tell me about Mother")
+    assert normalize_query("Tell me about Please Stand By") == "tell me about please stand by"
+
+
+def test_polite_and_spacing_variants_share_a_key():
+    assert normalize_query("  Tell me  about   DUNE?  ") == "tell me about dune"
+    assert normalize_query("Please recommend a thriller") == "recommend a thriller"
+    assert normalize_query("Recommend a thriller, please?") == "recommend a thriller"
@@ -1,64 +1,461 @@
+import atexit
 import os
 import re
+import sqlite3
+import threading
 import time
 import requests
-from typing import Dict, List, Any, Optional, Type, Union
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, List, Any, Optional, Tuple, Type, Union
+from urllib.parse import urlencode
 from dotenv import load_dotenv
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
+from itertools import islice
+from operator import itemgetter
 from pydantic import BaseModel, Field
 from crewai.tools import BaseTool
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 load_dotenv()
 
 TMDB_API_KEY = os.getenv("TMDB_API_KEY")
+# Optional v4 read access token; when set it replaces the api_key query param
+TMDB_READ_TOKEN = os.getenv("TMDB_READ_TOKEN")
 TMDB_BASE_URL = "https://api.themoviedb.org/3"
+TMDB_TIMEOUT = (3, 10)
+
+# Shared keep-alive session so TMDB calls reuse pooled TCP/TLS connections
+tmdb_session = requests.Session()
+tmdb_session.mount("https://", HTTPAdapter(
+    pool_connections=50,
+    pool_maxsize=50,
+    # Rate limits (429) are retried here too, sleeping for TMDB's Retry-After
+    max_retries=Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods={"GET"},
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+))
+if TMDB_READ_TOKEN:
+    tmdb_session.headers["Authorization"] = f"Bearer {TMDB_READ_TOKEN}"
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until another request may be sent"""
+    
+    def __init__(self, capacity=40, period=10.0):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+# Keeps bursts from agent fan-out under TMDB's 40 requests / 10 seconds instead of
+# spending round-trips on 429s; cache hits never take a token
+tmdb_rate_limiter = TokenBucket(capacity=40, period=10.0)
+
+# Seconds a successful response stays fresh, by endpoint prefix (first match wins)
+TMDB_CACHE_TTLS = [
+    ("search/", 600),
+    ("trending/", 3600),
+    ("discover/", 3600),
+    ("movie/", 86400),
+    ("tv/", 86400),
+    ("genre/", 86400)
+]
+TMDB_DEFAULT_TTL = 600
+# Expired responses that carry an ETag are kept this long for conditional revalidation
+TMDB_REVALIDATE_WINDOW = 7 * 86400
+# Rows dropped per write, and the row cap enforced every TMDB_CACHE_TRIM_EVERY writes
+TMDB_CACHE_PURGE_BATCH = 64
+TMDB_CACHE_MAX_ROWS = 50000
+TMDB_CACHE_TRIM_EVERY = 256
+
+_MAX_AGE_PATTERN = re.compile(r"max-age=(\d+)")
+
+class TMDBResponseCache:
+    """Persistent SQLite cache of successful TMDB responses with per-endpoint TTLs"""
+    
+    def __init__(self, cache_file="tmdb_cache.db", max_rows=TMDB_CACHE_MAX_ROWS):
+        self.cache_file = cache_file
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes = 0
+    
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # Opened on first use; callers hold self._lock
+        if self._conn is None:
+            conn = sqlite3.connect(self.cache_file, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, body BLOB, expires REAL, etag TEXT)")
+            conn.execute("CREATE INDEX IF NOT EXISTS responses_expires ON responses (expires)")
+            self._conn = conn
+            self._purge_expired()
+        return self._conn
+    
+    def _purge_expired(self, limit: int = -1):
+        # Range scan on the expires index; callers hold self._lock. A negative limit removes every purgeable row
+        now = time.time()
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+            "WHERE expires < ? AND (etag IS NULL OR expires < ?) LIMIT ?)",
+            (now, now - TMDB_REVALIDATE_WINDOW, limit)
+        )
+    
+    def _trim(self):
+        # Drops the soonest-expiring rows past max_rows; callers hold self._lock
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY expires "
+            "LIMIT MAX((SELECT COUNT(*) FROM responses) - ?, 0))",
+            (self.max_rows,)
+        )
+    
+    @staticmethod
+    def make_key(endpoint: str, params: Dict[str, Any]) -> str:
+        """Cache key from the endpoint and sorted params, never including the API key"""
+        return f"{endpoint}?{urlencode(sorted((k, v) for k, v in params.items() if k != 'api_key'))}"
+    
+    @staticmethod
+    def ttl_for(endpoint: str) -> int:
+        return next((ttl for prefix, ttl in TMDB_CACHE_TTLS if endpoint.startswith(prefix)), TMDB_DEFAULT_TTL)
+    
+    def response_ttl(self, endpoint: str, response: requests.Response) -> float:
+        """Seconds to keep a response: the endpoint TTL capped by Cache-Control, 0 to skip"""
+        if response.status_code not in (200, 304):
+            return 0
+        cache_control = response.headers.get("Cache-Control", "").lower()
+        if "no-store" in cache_control or "no-cache" in cache_control:
+            return 0
+        ttl = self.ttl_for(endpoint)
+        max_age = _MAX_AGE_PATTERN.search(cache_control)
+        if max_age:
+            ttl = min(ttl, int(max_age.group(1)))
+        return ttl
+    
+    def get(self, key: str) -> Optional[Tuple[bytes, float, Optional[str]]]:
+        """
+        Returns the stored body, its remaining lifetime in seconds and its ETag.
+        Expired entries are returned (with a negative lifetime) only when they
+        have an ETag, so the caller can revalidate them with If-None-Match.
+        """
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT body, expires, etag FROM responses WHERE key = ? AND (expires >= ? OR etag IS NOT NULL)",
+                (key, now)
+            ).fetchone()
+        return (row[0], row[1] - now, row[2]) if row else None
+    
+    def set(self, key: str, body: bytes, ttl: float, etag: Optional[str] = None):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, body, time.time() + ttl, etag)
+            )
+            # Expired rows are otherwise only removed on open, so clean up a bounded batch per write
+            self._purge_expired(TMDB_CACHE_PURGE_BATCH)
+            self._writes += 1
+            if self._writes % TMDB_CACHE_TRIM_EVERY == 0:
+                self._trim()
+    
+    def refresh(self, key: str, ttl: float):
+        """Extends the lifetime of an entry TMDB confirmed as unchanged (304)"""
+        with self._lock:
+            self.conn.execute("UPDATE responses SET expires = ? WHERE key = ?", (time.time() + ttl, key))
+    
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM responses")
+
+tmdb_cache = TMDBResponseCache()
+
+class TTLMemoryCache:
+    """Small thread-safe in-process LRU of parsed responses with per-entry expiry"""
+    
+    def __init__(self, max_size=4096, ttl=900):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: Dict[str, Any], ttl: Optional[float] = None):
+        # Never keep an entry longer than the persistent cache would
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Repeat lookups within a run skip both the SQLite read and the JSON decode
+tmdb_memory_cache = TTLMemoryCache()
 
-def make_tmdb_request(endpoint, params=None):
+def make_tmdb_request(endpoint, params=None, use_cache=True):
     if params is None:
         params = {}
     
     clean_params = {k: v for k, v in params.items() if v is not None and v != "None"}
     
-    clean_params["api_key"] = TMDB_API_KEY
+    cache_key = tmdb_cache.make_key(endpoint, clean_params)
+    if use_cache:
+        data = tmdb_memory_cache.get(cache_key)
+        if data is not None:
+            return data
+    
+    cached_body = etag = None
+    cached = tmdb_cache.get(cache_key)
+    if cached is not None:
+        cached_body, remaining, etag = cached
+        if use_cache and remaining > 0:
+            data = json_loads(cached_body)
+            tmdb_memory_cache.set(cache_key, data, remaining)
+            return data
+    
+    if not TMDB_READ_TOKEN:
+        clean_params["api_key"] = TMDB_API_KEY
+    headers = {"If-None-Match": etag} if etag else None
     
     try:
-        response = requests.get(f"{TMDB_BASE_URL}/{endpoint}", params=clean_params)
-        response.raise_for_status()
-        return response.json()
+        tmdb_rate_limiter.acquire()
+        response = tmdb_session.get(
+            f"{TMDB_BASE_URL}/{endpoint}", params=clean_params, headers=headers, timeout=TMDB_TIMEOUT
+        )
+        if response.status_code >= 400:
+            # Name the endpoint, not the full URL, which can carry the api_key
+            error = f"{response.status_code} {response.reason} for {endpoint}"
+            print(f"API request error: {error}")
+            return {"error": error, "results": []}
+        ttl = tmdb_cache.response_ttl(endpoint, response)
+        if response.status_code == 304:
+            # Unchanged since it was stored: reuse the cached body and extend its lifetime
+            data = json_loads(cached_body)
+            if ttl > 0:
+                tmdb_cache.refresh(cache_key, ttl)
+        else:
+            data = json_loads(response.content)
+            if ttl > 0:
+                tmdb_cache.set(cache_key, response.content, ttl, response.headers.get("ETag"))
+        if ttl > 0:
+            tmdb_memory_cache.set(cache_key, data, ttl)
+        return data
     except requests.exceptions.RequestException as e:
-        response_status = getattr(e.response, 'status_code', None)
-        if response_status == 429:
-            retry_after = int(e.response.headers.get("Retry-After", 1))
-            time.sleep(retry_after)
-            return make_tmdb_request(endpoint, params)
-        
-        print(f"API request error: {str(e)}")
+        # str(e) can include the request URL, and with it the api_key param
+        error = f"{type(e).__name__} for {endpoint}"
+        print(f"API request error: {error}")
+        return {"error": error, "results": []}
+    except ValueError as e:
+        print(f"API response decode error: {str(e)}")
         return {"error": str(e), "results": []}
 
-@lru_cache(maxsize=128)
+@lru_cache(maxsize=1)
+def get_token_encoder():
+    """Returns the cl100k_base encoder used by gpt-3.5-turbo, loaded only once"""
+    import tiktoken
+    return tiktoken.get_encoding("cl100k_base")
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Truncates text to max_tokens LLM tokens, falling back to ~4 chars per token"""
+    try:
+        encoder = get_token_encoder()
+    except Exception:
+        max_chars = max_tokens * 4
+        return text[:max_chars] + "..." if len(text) > max_chars else text
+    
+    tokens = encoder.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoder.decode(tokens[:max_tokens]) + "..."
+
+def release_year(date: Optional[str]) -> str:
+    """Year part of a TMDB YYYY-MM-DD date, or N/A when missing"""
+    return date[:4] if date else "N/A"
+
+GENRE_IDS = {
+    "Action": 28, "Adventure": 12, "Animation": 16,
+    "Comedy": 35, "Crime": 80, "Documentary": 99,
+    "Drama": 18, "Family": 10751, "Fantasy": 14,
+    "History": 36, "Horror": 27, "Mystery": 9648,
+    "Romance": 10749, "Science Fiction": 878, "Sci-Fi": 878,
+    "Thriller": 53, "War": 10752, "Western": 37
+}
+# Lowercased once at import; the tuple keeps GENRE_IDS order for partial matches
+_GENRE_EXACT = {name.lower(): genre_id for name, genre_id in GENRE_IDS.items()}
+_GENRE_PARTIAL = tuple(_GENRE_EXACT.items())
+
+GENRE_MAP_RETRY_SECONDS = 300
+_tmdb_genre_map = None
+_tmdb_genre_map_failed_at = None
+_tmdb_genre_map_lock = threading.Lock()
+
+def get_tmdb_genre_map() -> Dict[str, int]:
+    """
+    TMDB's canonical movie genres by lowercase name, fetched once per process.
+    After a failed fetch it returns {} for GENRE_MAP_RETRY_SECONDS, so callers
+    fall back to the static table instead of waiting on retries every lookup.
+    """
+    global _tmdb_genre_map, _tmdb_genre_map_failed_at
+    # Held across the fetch so concurrent first lookups share one request
+    with _tmdb_genre_map_lock:
+        if _tmdb_genre_map is not None:
+            return _tmdb_genre_map
+        if _tmdb_genre_map_failed_at is not None and time.time() - _tmdb_genre_map_failed_at < GENRE_MAP_RETRY_SECONDS:
+            return {}
+        data = make_tmdb_request("genre/movie/list", {"language": "en-US"})
+        genres = {genre["name"].lower(): genre["id"] for genre in data.get("genres", [])}
+        if not genres:
+            _tmdb_genre_map_failed_at = time.time()
+            return {}
+        _tmdb_genre_map = genres
+        return _tmdb_genre_map
+
 def get_genre_id(genre_name: str) -> Optional[int]:
     if not genre_name or genre_name == "None":
         return None
-        
-    genres = {
-        "Action": 28, "Adventure": 12, "Animation": 16,
-        "Comedy": 35, "Crime": 80, "Documentary": 99,
-        "Drama": 18, "Family": 10751, "Fantasy": 14,
-        "History": 36, "Horror": 27, "Mystery": 9648,
-        "Romance": 10749, "Science Fiction": 878, "Sci-Fi": 878,
-        "Thriller": 53, "War": 10752, "Western": 37
-    }
     
-    normalized_genre = genre_name.title()
-    if normalized_genre in genres:
-        return genres[normalized_genre]
+    normalized_genre = genre_name.strip().lower()
+    # TMDB's own list first, so newly added genres resolve; GENRE_IDS covers aliases and offline use
+    genre_id = get_tmdb_genre_map().get(normalized_genre) or _GENRE_EXACT.get(normalized_genre)
+    if genre_id:
+        return genre_id
     
-    for key, value in genres.items():
-        if key.lower() in genre_name.lower():
+    for key, value in _GENRE_PARTIAL:
+        if key in normalized_genre:
             return value
             
     return None
 
+def _compile_phrases(phrases: List[str]) -> "re.Pattern":
+    """Builds a single regex that matches if any of the literal phrases occurs"""
+    return re.compile("|".join(re.escape(phrase) for phrase in phrases))
+
+_INFO_PATTERN = _compile_phrases([
+    "tell me about", "information about", "details of", "details about",
+    "what is", "who is", "synopsis of", "plot of",
+    "describe", "rating of", "how long is", "when was",
+    "who directed", "who played", "what genre", "rated"
+])
+_PERSON_PATTERN = _compile_phrases(["actor", "actress", "director", "who played", "cast of"])
+_PERSON_TYPES = ["actor", "actress", "director", "who played", "cast"]
+_SPECIFIC_PATTERNS = {
+    query_type: _compile_phrases(patterns) for query_type, patterns in {
+        "director": ["who directed", "who was the director", "director of"],
+        "rating": ["what rating", "how well rated", "imdb rating", "rotten tomatoes", "score of"],
+        "cast": ["who starred in", "who plays in", "actors in", "cast of"],
+        "release": ["when was released", "release date", "when did it come out"],
+        "duration": ["how long is", "runtime of", "duration of", "how many seasons"],
+        "genre": ["what genre is", "which genre", "type of movie"]
+    }.items()
+}
+_RECOMMENDATION_PATTERN = _compile_phrases([
+    "recommend", "suggestion", "similar to", "like",
+    "movies about", "shows about", "watch", "good movies",
+    "best movies", "movies with"
+])
+_TRENDS_PATTERN = _compile_phrases([
+    "trending", "popular", "top rated", "best of",
+    "this week", "this month", "new releases",
+    "what's hot", "what is popular"
+])
+
+def classify_query_intent(query: str) -> Dict[str, Any]:
+    """
+    Classifies a user query into an intent and the agent that should handle it.
+    Each keyword category is a precompiled alternation, so the query is
+    scanned once per category instead of once per keyword. Results are
+    memoized per lowercased query; callers get their own copy.
+    """
+    return dict(_classify_lowered_query(query.lower()))
+
+@lru_cache(maxsize=512)
+def _classify_lowered_query(query: str) -> Dict[str, Any]:
+    if _INFO_PATTERN.search(query):
+        if _PERSON_PATTERN.search(query):
+            specific_type = next((term for term in _PERSON_TYPES if term in query), "person")
+            return {
+                "intent": "person_info",
+                "confidence": 0.9,
+                "target_agent": "information_agent",
+                "specific_query": True,
+                "query_type": specific_type
+            }
+        
+        for query_type, pattern in _SPECIFIC_PATTERNS.items():
+            if pattern.search(query):
+                return {
+                    "intent": "movie_info_specific",
+                    "confidence": 0.95,
+                    "target_agent": "information_agent",
+                    "specific_query": True,
+                    "query_type": query_type
+                }
+        
+        return {
+            "intent": "movie_info_general",
+            "confidence": 0.9,
+            "target_agent": "information_agent",
+            "specific_query": False
+        }
+    
+    if _RECOMMENDATION_PATTERN.search(query):
+        return {
+            "intent": "recommendation",
+            "confidence": 0.85,
+            "target_agent": "recommendation_agent"
+        }
+    
+    if _TRENDS_PATTERN.search(query):
+        return {
+            "intent": "trends",
+            "confidence": 0.95,
+            "target_agent": "trends_agent"
+        }
+        
+    return {
+        "intent": "recommendation", 
+        "confidence": 0.6,
+        "target_agent": "recommendation_agent"
+    }
+
 class IntentClassifierSchema(BaseModel):
     query: str = Field(description="The user query to classify")
 
@@ -68,73 +465,185 @@ class IntentClassifierTool(BaseTool):
     args_schema: Type[BaseModel] = IntentClassifierSchema
     
     def _run(self, query: str):
-        query = query.lower()
-        
-        if any(pattern in query for pattern in ["tell me about", "information about", "details of", "details about", 
-                                              "what is", "who is", "synopsis of", "plot of", 
-                                              "describe", "rating of", "how long is", "when was", 
-                                              "who directed", "who played", "what genre", "rated"]):
-            
-            if any(term in query for term in ["actor", "actress", "director", "who played", "cast of"]):
-                specific_type = next((term for term in ["actor", "actress", "director", "who played", "cast"] 
-                                    if term in query), "person")
-                return {
-                    "intent": "person_info",
-                    "confidence": 0.9,
-                    "target_agent": "information_agent",
-                    "specific_query": True,
-                    "query_type": specific_type
-                }
-            
-            specific_queries = {
-                "director": ["who directed", "who was the director", "director of"],
-                "rating": ["what rating", "how well rated", "imdb rating", "rotten tomatoes", "score of"],
-                "cast": ["who starred in", "who plays in", "actors in", "cast of"],
-                "release": ["when was released", "release date", "when did it come out"],
-                "duration": ["how long is", "runtime of", "duration of", "how many seasons"],
-                "genre": ["what genre is", "which genre", "type of movie"]
-            }
-            
-            for query_type, patterns in specific_queries.items():
-                if any(pattern in query for pattern in patterns):
-                    return {
-                        "intent": "movie_info_specific",
-                        "confidence": 0.95,
-                        "target_agent": "information_agent",
-                        "specific_query": True,
-                        "query_type": query_type
-                    }
-            
-            return {
-                "intent": "movie_info_general",
-                "confidence": 0.9,
-                "target_agent": "information_agent",
-                "specific_query": False
-            }
-                    
-        if any(pattern in query for pattern in ["recommend", "suggestion", "similar to", "like", 
-                                              "movies about", "shows about", "watch", "good movies", 
-                                              "best movies", "movies with"]):
-            return {
-                "intent": "recommendation",
-                "confidence": 0.85,
-                "target_agent": "recommendation_agent"
-            }
-        
-        if any(pattern in query for pattern in ["trending", "popular", "top rated", "best of", 
-                                              "this week", "this month", "new releases", 
-                                              "what's hot", "what is popular"]):
-            return {
-                "intent": "trends",
-                "confidence": 0.95,
-                "target_agent": "trends_agent"
-            }
+        return classify_query_intent(query)
+
+# Shared across tool calls so fan-out doesn't pay thread start-up on every invocation
+tmdb_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tmdb")
+
+# Everything the tools read about a title comes back in one details call, so
+# details, similar and reviews lookups share a single (cached) TMDB round-trip
+CONTENT_BUNDLE_APPENDS = {
+    "movie": "credits,similar,videos,release_dates,reviews",
+    "tv": "credits,similar,videos,content_ratings,reviews"
+}
+
+WRITER_JOBS = frozenset({"Writer", "Screenplay"})
+CAST_FIELDS = itemgetter("name", "character")
+MOVIE_REFERENCE_FIELDS = itemgetter("id", "title")
+TV_REFERENCE_FIELDS = itemgetter("id", "name")
+
+def fetch_content_bundle(content_type: str, content_id: int) -> Dict[str, Any]:
+    """Fetches a movie or TV show with all appended sub-resources in one request"""
+    return make_tmdb_request(
+        f"{content_type}/{content_id}",
+        {
+            "language": "en-US",
+            "append_to_response": CONTENT_BUNDLE_APPENDS[content_type]
+        }
+    )
+
+def fetch_movie_details(content_id: int) -> Dict[str, Any]:
+    """Fetches and formats the full details of a movie by its TMDB ID"""
+    details = fetch_content_bundle("movie", content_id)
+    if "error" in details:
+        return {
+            "status": "not_found",
+            "message": f"Could not fetch movie {content_id}: {details['error']}"
+        }
+    
+    rating = "Not rated"
+    if "release_dates" in details:
+        for country in details["release_dates"]["results"]:
+            if country["iso_3166_1"] == "US":
+                for release in country["release_dates"]:
+                    if release.get("certification"):
+                        rating = release["certification"]
+                        break
+    
+    credits = details.get("credits") or {}
+    
+    # One pass over the crew, stopping once the director and three writers are found
+    director = None
+    writers = []
+    for member in credits.get("crew", []):
+        job = member.get("job")
+        if job == "Director":
+            if director is None:
+                director = member["name"]
+        elif job in WRITER_JOBS and len(writers) < 3:
+            writers.append(member["name"])
+        if director is not None and len(writers) == 3:
+            break
+    if director is None:
+        director = "Unknown"
+    
+    trailer = ""
+    for video in details.get("videos", {}).get("results", []):
+        if video.get("type") == "Trailer" and video.get("site") == "YouTube":
+            trailer = f"https://www.youtube.com/watch?v={video['key']}"
+            break
             
+    return {
+        "status": "success",
+        "content_type": "movie",
+        "id": details.get("id"),
+        "title": details.get("title"),
+        "original_title": details.get("original_title"),
+        "tagline": details.get("tagline"),
+        "overview": details.get("overview"),
+        "release_date": details.get("release_date"),
+        "runtime": details.get("runtime"),
+        "rating": details.get("vote_average"),
+        "vote_count": details.get("vote_count"),
+        "popularity": details.get("popularity"),
+        "genres": [g["name"] for g in details.get("genres", [])],
+        "content_rating": rating,
+        "director": director,
+        "writers": writers,
+        "cast": [{"name": name, "character": character}
+               for name, character in map(CAST_FIELDS, islice(credits.get("cast", []), 10))],
+        "budget": details.get("budget"),
+        "revenue": details.get("revenue"),
+        "poster_path": details.get("poster_path"),
+        "trailer": trailer,
+        "similar": [{"id": item_id, "title": title}
+                  for item_id, title in map(MOVIE_REFERENCE_FIELDS, islice(details.get("similar", {}).get("results", []), 5))]
+    }
+
+def fetch_tv_details(content_id: int) -> Dict[str, Any]:
+    """Fetches and formats the full details of a TV show by its TMDB ID"""
+    details = fetch_content_bundle("tv", content_id)
+    if "error" in details:
         return {
-            "intent": "recommendation", 
-            "confidence": 0.6,
-            "target_agent": "recommendation_agent"
+            "status": "not_found",
+            "message": f"Could not fetch tv {content_id}: {details['error']}"
         }
+    
+    rating = "Not rated"
+    if "content_ratings" in details:
+        for country in details["content_ratings"]["results"]:
+            if country["iso_3166_1"] == "US":
+                rating = country["rating"]
+                break
+    
+    creators = [p["name"] for p in details.get("created_by", [])]
+    
+    season_count = episode_count = 0
+    for season in details.get("seasons", []):
+        season_count += 1
+        episode_count += season.get("episode_count", 0)
+    
+    trailer = ""
+    for video in details.get("videos", {}).get("results", []):
+        if video.get("type") == "Trailer" and video.get("site") == "YouTube":
+            trailer = f"https://www.youtube.com/watch?v={video['key']}"
+            break
+            
+    return {
+        "status": "success",
+        "content_type": "tv",
+        "id": details.get("id"),
+        "title": details.get("name"),
+        "original_title": details.get("original_name"),
+        "tagline": details.get("tagline"),
+        "overview": details.get("overview"),
+        "first_air_date": details.get("first_air_date"),
+        "last_air_date": details.get("last_air_date"),
+        "rating": details.get("vote_average"),
+        "vote_count": details.get("vote_count"),
+        "popularity": details.get("popularity"),
+        "status": details.get("status"),
+        "genres": [g["name"] for g in details.get("genres", [])],
+        "content_rating": rating,
+        "creators": creators,
+        "seasons": season_count,
+        "episodes": episode_count,
+        "cast": [{"name": name, "character": character}
+               for name, character in map(CAST_FIELDS, islice(details.get("credits", {}).get("cast", []), 10))],
+        "poster_path": details.get("poster_path"),
+        "trailer": trailer,
+        "networks": [n["name"] for n in details.get("networks", [])],
+        "similar": [{"id": item_id, "title": title}
+                  for item_id, title in map(TV_REFERENCE_FIELDS, islice(details.get("similar", {}).get("results", []), 5))]
+    }
+
+# Fields every formatted search/discover/trending result reads, fetched in one call
+MOVIE_RESULT_FIELDS = itemgetter("id", "title", "overview", "vote_average", "popularity")
+TV_RESULT_FIELDS = itemgetter("id", "name", "overview", "vote_average", "popularity")
+
+def movie_summary(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact form of a movie from a search, discover, similar or trending listing"""
+    item_id, title, overview, rating, popularity = MOVIE_RESULT_FIELDS(item)
+    return {
+        "id": item_id,
+        "title": title,
+        "overview": overview,
+        "year": release_year(item.get("release_date")),
+        "rating": rating,
+        "popularity": popularity
+    }
+
+def tv_summary(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact form of a TV show from a search, similar or trending listing"""
+    item_id, title, overview, rating, popularity = TV_RESULT_FIELDS(item)
+    return {
+        "id": item_id,
+        "title": title,
+        "overview": overview,
+        "year": release_year(item.get("first_air_date")),
+        "rating": rating,
+        "popularity": popularity
+    }
 
 class FetchMovieInfoSchema(BaseModel):
     query: str = Field(description="Movie or TV show title to search for")
@@ -172,106 +681,29 @@ class FetchMovieInfoTool(BaseTool):
         content_id = results[0]["id"]
         
         if content_type == "movie":
-            details = make_tmdb_request(
-                f"movie/{content_id}", 
-                {"language": "en-US", "append_to_response": "credits,similar,videos,release_dates"}
-            )
-            
-            rating = "Not rated"
-            if "release_dates" in details:
-                for country in details["release_dates"]["results"]:
-                    if country["iso_3166_1"] == "US":
-                        for release in country["release_dates"]:
-                            if release.get("certification"):
-                                rating = release["certification"]
-                                break
-            
-            director = next((c["name"] for c in details.get("credits", {}).get("crew", []) 
-                          if c.get("job") == "Director"), "Unknown")
-            
-            writers = [c["name"] for c in details.get("credits", {}).get("crew", [])
-                    if c.get("job") in ["Writer", "Screenplay"]]
-            
-            trailer = ""
-            for video in details.get("videos", {}).get("results", []):
-                if video.get("type") == "Trailer" and video.get("site") == "YouTube":
-                    trailer = f"https://www.youtube.com/watch?v={video['key']}"
-                    break
-                    
-            return {
-                "status": "success",
-                "content_type": "movie",
-                "id": details.get("id"),
-                "title": details.get("title"),
-                "original_title": details.get("original_title"),
-                "tagline": details.get("tagline"),
-                "overview": details.get("overview"),
-                "release_date": details.get("release_date"),
-                "runtime": details.get("runtime"),
-                "rating": details.get("vote_average"),
-                "vote_count": details.get("vote_count"),
-                "popularity": details.get("popularity"),
-                "genres": [g["name"] for g in details.get("genres", [])],
-                "content_rating": rating,
-                "director": director,
-                "writers": writers[:3],
-                "cast": [{"name": c["name"], "character": c["character"]} 
-                       for c in details.get("credits", {}).get("cast", [])[:10]],
-                "budget": details.get("budget"),
-                "revenue": details.get("revenue"),
-                "poster_path": details.get("poster_path"),
-                "trailer": trailer,
-                "similar": [{"id": m["id"], "title": m["title"]} 
-                          for m in details.get("similar", {}).get("results", [])[:5]]
-            }
-        else:
-            details = make_tmdb_request(
-                f"tv/{content_id}", 
-                {"language": "en-US", "append_to_response": "credits,similar,videos,content_ratings"}
-            )
-            
-            rating = "Not rated"
-            if "content_ratings" in details:
-                for country in details["content_ratings"]["results"]:
-                    if country["iso_3166_1"] == "US":
-                        rating = country["rating"]
-                        break
-            
-            creators = [p["name"] for p in details.get("created_by", [])]
-            
-            trailer = ""
-            for video in details.get("videos", {}).get("results", []):
-                if video.get("type") == "Trailer" and video.get("site") == "YouTube":
-                    trailer = f"https://www.youtube.com/watch?v={video['key']}"
-                    break
-                    
-            return {
-                "status": "success",
-                "content_type": "tv",
-                "id": details.get("id"),
-                "title": details.get("name"),
-                "original_title": details.get("original_name"),
-                "tagline": details.get("tagline"),
-                "overview": details.get("overview"),
-                "first_air_date": details.get("first_air_date"),
-                "last_air_date": details.get("last_air_date"),
-                "rating": details.get("vote_average"),
-                "vote_count": details.get("vote_count"),
-                "popularity": details.get("popularity"),
-                "status": details.get("status"),
-                "genres": [g["name"] for g in details.get("genres", [])],
-                "content_rating": rating,
-                "creators": creators,
-                "seasons": len(details.get("seasons", [])),
-                "episodes": sum(s.get("episode_count", 0) for s in details.get("seasons", [])),
-                "cast": [{"name": c["name"], "character": c["character"]} 
-                       for c in details.get("credits", {}).get("cast", [])[:10]],
-                "poster_path": details.get("poster_path"),
-                "trailer": trailer,
-                "networks": [n["name"] for n in details.get("networks", [])],
-                "similar": [{"id": s["id"], "title": s["name"]} 
-                          for s in details.get("similar", {}).get("results", [])[:5]]
-            }
+            return fetch_movie_details(content_id)
+        return fetch_tv_details(content_id)
+
+class FetchMultipleMoviesInfoSchema(BaseModel):
+    movie_ids: List[int] = Field(description="TMDB IDs of the movies to fetch (up to 10)")
+
+class FetchMultipleMoviesInfoTool(BaseTool):
+    name: str = "fetch_multiple_movies_info"
+    description: str = "Fetches detailed information about several movies at once by their TMDB IDs"
+    args_schema: Type[BaseModel] = FetchMultipleMoviesInfoSchema
+    
+    def _run(self, movie_ids: List[int]):
+        movie_ids = list(dict.fromkeys(movie_ids))[:10]
+        if not movie_ids:
+            return {"status": "error", "message": "No movie IDs given"}
+        
+        # TMDB calls are network-bound, so fetch them concurrently over the pooled session
+        movies = list(tmdb_executor.map(fetch_movie_details, movie_ids))
+        
+        return {
+            "status": "success",
+            "movies": movies
+        }
 
 class FetchMovieReviewsTool(BaseTool):
     name: str = "fetch_movie_reviews"
@@ -279,19 +711,21 @@ class FetchMovieReviewsTool(BaseTool):
     args_schema: Type[BaseModel] = FetchMovieReviewsSchema
     
     def _run(self, movie_id: int):
-        reviews = make_tmdb_request(f"movie/{movie_id}/reviews")
+        bundle = fetch_content_bundle("movie", movie_id)
         content_type = "movie"
         
-        if "status_code" in reviews and reviews["status_code"] == 34:
-            reviews = make_tmdb_request(f"tv/{movie_id}/reviews")
+        if "error" in bundle:
+            bundle = fetch_content_bundle("tv", movie_id)
             content_type = "tv"
+        
+        reviews = bundle.get("reviews", {})
             
         formatted_reviews = []
-        for review in reviews.get("results", [])[:5]:
+        for review in islice(reviews.get("results", []), 5):
             formatted_reviews.append({
                 "author": review.get("author", "Anonymous"),
                 "rating": review.get("author_details", {}).get("rating"),
-                "content": review.get("content", "")[:300] + "..." if len(review.get("content", "")) > 300 else review.get("content", ""),
+                "content": truncate_to_tokens(review.get("content", ""), 75),
                 "url": review.get("url"),
                 "created_at": review.get("created_at")
             })
@@ -341,29 +775,11 @@ class SearchSimilarMoviesTool(BaseTool):
             content_type = "movie"
             original_title = movie_results[0]["title"]
             
-        similar_data = make_tmdb_request(f"{content_type}/{content_id}/similar")
-        similar_results = similar_data.get("results", [])[:max_results]
+        bundle = fetch_content_bundle(content_type, content_id)
+        similar_results = islice(bundle.get("similar", {}).get("results", []), max(max_results, 0))
         
-        formatted_results = []
-        for item in similar_results:
-            if content_type == "movie":
-                formatted_results.append({
-                    "id": item["id"],
-                    "title": item["title"],
-                    "overview": item["overview"],
-                    "year": item["release_date"].split("-")[0] if item.get("release_date") else "N/A",
-                    "rating": item["vote_average"],
-                    "popularity": item["popularity"]
-                })
-            else:
-                formatted_results.append({
-                    "id": item["id"],
-                    "title": item["name"],
-                    "overview": item["overview"],
-                    "year": item["first_air_date"].split("-")[0] if item.get("first_air_date") else "N/A",
-                    "rating": item["vote_average"],
-                    "popularity": item["popularity"]
-                })
+        summarize = movie_summary if content_type == "movie" else tv_summary
+        formatted_results = [summarize(item) for item in similar_results]
                 
         return {
             "status": "success",
@@ -408,16 +824,7 @@ class RecommendByGenreTool(BaseTool):
         discover_data = make_tmdb_request("discover/movie", params)
         results = discover_data.get("results", [])[:max_results]
         
-        formatted_results = []
-        for item in results:
-            formatted_results.append({
-                "id": item["id"],
-                "title": item["title"],
-                "overview": item["overview"],
-                "year": item["release_date"].split("-")[0] if item.get("release_date") else "N/A",
-                "rating": item["vote_average"],
-                "popularity": item["popularity"]
-            })
+        formatted_results = [movie_summary(item) for item in results]
             
         return {
             "status": "success",
@@ -427,6 +834,50 @@ class RecommendByGenreTool(BaseTool):
             "results": formatted_results
         }
 
+TRENDING_PREFETCH_INTERVAL = 600
+_trending_prefetch_lock = threading.Lock()
+_trending_prefetch_stop = threading.Event()
+_trending_prefetch_timer = None
+_trending_prefetch_started = False
+
+def _schedule_trending_prefetch_locked():
+    # Callers hold _trending_prefetch_lock
+    global _trending_prefetch_timer
+    if _trending_prefetch_stop.is_set():
+        return
+    _trending_prefetch_timer = threading.Timer(TRENDING_PREFETCH_INTERVAL, prefetch_trending)
+    _trending_prefetch_timer.daemon = True
+    _trending_prefetch_timer.start()
+
+def _schedule_trending_prefetch():
+    with _trending_prefetch_lock:
+        _schedule_trending_prefetch_locked()
+
+def prefetch_trending():
+    """Refreshes every trending listing in the response caches, then reschedules itself"""
+    for media_type in ("all", "movie", "tv"):
+        for time_window in ("day", "week"):
+            make_tmdb_request(f"trending/{media_type}/{time_window}", use_cache=False)
+    _schedule_trending_prefetch()
+
+def start_trending_prefetch():
+    """Starts the background refresh once; trending results are the same for every user"""
+    global _trending_prefetch_started
+    # Checked and set under the lock so concurrent first calls start a single chain
+    with _trending_prefetch_lock:
+        if _trending_prefetch_started:
+            return
+        _trending_prefetch_started = True
+        _schedule_trending_prefetch_locked()
+
+def stop_trending_prefetch():
+    _trending_prefetch_stop.set()
+    with _trending_prefetch_lock:
+        if _trending_prefetch_timer is not None:
+            _trending_prefetch_timer.cancel()
+
+atexit.register(stop_trending_prefetch)
+
 class FetchTrendingMoviesSchema(BaseModel):
     media_type: str = Field(default="all", description="Media type: all, movie, tv")
     time_window: str = Field(default="week", description="Time window: day, week")
@@ -446,6 +897,7 @@ class FetchTrendingMoviesTool(BaseTool):
         if time_window not in valid_time_windows:
             time_window = "week"
             
+        start_trending_prefetch()
         trending_data = make_tmdb_request(f"trending/{media_type}/{time_window}")
         results = trending_data.get("results", [])[:max_results]
         
@@ -453,25 +905,13 @@ class FetchTrendingMoviesTool(BaseTool):
         for item in results:
             content_type = item.get("media_type")
             if content_type == "movie":
-                formatted_results.append({
-                    "id": item["id"],
-                    "title": item["title"],
-                    "overview": item["overview"],
-                    "year": item["release_date"].split("-")[0] if item.get("release_date") else "N/A",
-                    "rating": item["vote_average"],
-                    "popularity": item["popularity"],
-                    "media_type": "movie"
-                })
+                summary = movie_summary(item)
             elif content_type == "tv":
-                formatted_results.append({
-                    "id": item["id"],
-                    "title": item["name"],
-                    "overview": item["overview"],
-                    "year": item["first_air_date"].split("-")[0] if item.get("first_air_date") else "N/A",
-                    "rating": item["vote_average"],
-                    "popularity": item["popularity"],
-                    "media_type": "tv"
-                })
+                summary = tv_summary(item)
+            else:
+                continue
+            summary["media_type"] = content_type
+            formatted_results.append(summary)
                 
         return {
             "status": "success",
@@ -484,6 +924,7 @@ class FetchTrendingMoviesTool(BaseTool):
 all_tools = {
     'intent_classifier': IntentClassifierTool(),
     'fetch_movie_info': FetchMovieInfoTool(),
+    'fetch_multiple_movies_info': FetchMultipleMoviesInfoTool(),
     'fetch_movie_reviews': FetchMovieReviewsTool(),
     'search_similar_movies': SearchSimilarMoviesTool(),
     'recommend_by_genre': RecommendByGenreTool(),